@@ -2,21 +2,33 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
+import hashlib
 import tempfile
+import textwrap
+from collections import OrderedDict
 from datetime import datetime
 
 # utils
 from utils.yolo_utils import (
     load_detections,
-    get_frame_detections,
-    compute_avg_detections,
+    filter_detections,
+    build_detections_index,
+    build_detections_arrays,
+    avg_detections_from_arrays,
     read_frame,
+    read_frame_from_capture,
+    open_video_capture,
+    bgr_to_rgb,
+    encode_jpeg,
+    fit_to_width,
     draw_bboxes_on_image,
     create_video_with_detections,
 )
 from utils.track_utils import (
     load_mot_tracks,
-    get_frame_tracks,
+    build_tracks_index,
+    build_tracks_arrays,
+    track_history_window,
     draw_tracks_on_image,
     create_video_with_tracks,
 )
@@ -27,6 +39,8 @@ from utils.shoe_utils import (
 from utils.mask_utils import (
     load_mask,
     apply_mask_to_frame,
+    apply_mask_overlay,
+    prepare_mask_overlay,
     get_masks_config
 )
 
@@ -55,6 +69,261 @@ def get_video_info_safe(path: str) -> dict:
     except Exception:
         return {}
 
+
+@st.cache_data(show_spinner=False)
+def _cached_video_info(path: str, mtime: float) -> dict:
+    """
+    Кэширует метаданные видео: файл probe-ится один раз на версию (path + mtime),
+    а не на каждый rerun.
+    """
+    return get_video_info_safe(path)
+
+def _file_mtime(path: str):
+    """mtime файла или None, если его нет — один stat вместо exists + getmtime"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _stat_row(label: str, value: str) -> str:
+    """HTML одной строки карточки «Информация о видео»"""
+    return f"""
+                <div class='info-row'><strong>{label}:</strong><span class='info-value'>{value}</span></div>"""
+
+
+@st.cache_data(show_spinner=False)
+def _video_info_html(path: str, mtime: float) -> str:
+    """
+    Строки карточки «Информация о видео», зависящие только от файла
+    (разрешение, FPS, длительность, кадры). Собираются один раз на версию файла.
+    """
+    info = _cached_video_info(path, mtime)
+    width = int(info.get('width') or 0)
+    height = int(info.get('height') or 0)
+    fps_val = float(info.get('fps') or 0)
+    duration_sec = int(info.get('duration') or 0)
+    frames_stat = int(info.get('frame_count') or 0)
+
+    res_str = f"{width} × {height}" if width > 0 and height > 0 else "—"
+    fps_str = f"{fps_val:.2f}" if fps_val > 0 else "—"
+    dur_str = f"{duration_sec} сек" if duration_sec > 0 else "—"
+    frames_str = f"{frames_stat}" if frames_stat > 0 else "—"
+    return (
+        f"{_stat_row('Разрешение', res_str)}\n"
+        f"{_stat_row('FPS', fps_str)}\n"
+        f"{_stat_row('Длительность', dur_str)}\n"
+        f"{_stat_row('Кадров', frames_str)}"
+    )
+
+
+@st.cache_data(show_spinner=False)
+def _shoes_chart_data(counts: dict) -> pd.DataFrame:
+    """
+    Таблица распределения обуви по типам для графика. Зависит только от counts,
+    поэтому строится один раз, а не на каждый rerun.
+    """
+    total = sum(counts.values())
+    return pd.DataFrame({
+        'Тип обуви': list(counts.keys()),
+        'Процент': [(count / total) * 100 for count in counts.values()],
+        'Количество': list(counts.values())
+    }).sort_values('Процент', ascending=False)
+
+
+@st.cache_resource(show_spinner=False)
+def _tracker_metrics_table() -> pd.DataFrame:
+    """
+    Статичная таблица метрик трекеров. app.py перевыполняется на каждый rerun, поэтому
+    константа на уровне модуля пересобиралась бы каждый раз — держим один объект.
+    """
+    return pd.DataFrame({
+        'Трекер': ['OC Sort', 'BoT Sort'],
+        'IDF1': [0.49, 0.49],
+        'MOTA': [0.43, 0.43],
+        'Switches': [92, 63]
+    })
+
+
+@st.cache_data(show_spinner=False)
+def _shoes_table_data(counts: dict) -> pd.DataFrame:
+    """Таблица «Детали распределения» с процентами в виде строк — тоже одна на counts"""
+    chart_data = _shoes_chart_data(counts)
+    return chart_data[['Тип обуви', 'Количество']].assign(
+        Процент=chart_data['Процент'].round(2).astype(str) + '%'
+    )
+
+
+def _get_cap(path: str):
+    """
+    Возвращает открытый cv2.VideoCapture для path, переиспользуя его между rerun-ами.
+    Позиция следующего декодируемого кадра хранится в st.session_state['_cap_pos'].
+    """
+    cached = st.session_state.get("_cap")
+    if cached is not None and cached[0] == path:
+        return cached[1]
+    if cached is not None:
+        cached[1].release()
+        st.session_state["_cap"] = None
+
+    import cv2
+    # Кадры выбираются через CAP_PROP_POS_FRAMES: точность перехода проверена только для
+    # программного декодирования, поэтому аппаратное здесь не запрашиваем
+    cap = open_video_capture(path, hw_accel=False)
+    if not cap.isOpened():
+        cap.release()
+        return None
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    st.session_state["_cap"] = (path, cap)
+    st.session_state["_cap_pos"] = 0
+    return cap
+
+
+def _get_prefetcher(path: str):
+    """Фоновый FramePrefetcher для path (один на сессию)"""
+    prefetcher = st.session_state.get("_prefetch")
+    if prefetcher is not None and prefetcher.video_path == path:
+        return prefetcher
+    if prefetcher is not None:
+        prefetcher.close()
+    from utils.video_processor import FramePrefetcher
+    prefetcher = FramePrefetcher(path, ahead=PREFETCH_AHEAD)
+    st.session_state["_prefetch"] = prefetcher
+    return prefetcher
+
+
+def read_frame_cached(path: str, frame_idx: int):
+    """
+    Читает кадр через закэшированный VideoCapture (grab()+retrieve() для коротких
+    переходов вперёд). При неудаче используется обычный read_frame.
+    Возвращаемый массив — переиспользуемый буфер: его можно менять на месте,
+    но нельзя хранить между rerun-ами.
+    """
+    if _CV2_OK:
+        # Сначала смотрим, не дочитал ли фоновый поток этот кадр заранее
+        prefetcher = _get_prefetcher(path)
+        frame = prefetcher.take(frame_idx)
+        if frame is not None:
+            prefetcher.request(frame_idx)
+            return frame
+
+        cap = _get_cap(path)
+        if cap is not None:
+            # Декодируем в один и тот же буфер, чтобы не выделять кадр заново на каждый rerun
+            frame, pos = read_frame_from_capture(
+                cap,
+                frame_idx,
+                st.session_state.get("_cap_pos", -1),
+                out=st.session_state.get("_scratch"),
+            )
+            st.session_state["_cap_pos"] = pos
+            prefetcher.request(frame_idx)
+            if frame is not None:
+                st.session_state["_scratch"] = frame
+                return frame
+    return read_frame(path, frame_idx)
+
+def _video_not_found(path: str):
+    """Заглушка на месте плеера, если видеофайл не найден"""
+    st.markdown(
+        """
+        <div style='background-color: #e9ecef; height: 400px; border-radius: 8px; 
+        display: flex; align-items: center; justify-content: center; color: #6c757d;'>
+            <div style='text-align: center;'>
+                <h2>📹 Video Not Found</h2>
+                <p>Видеофайл не найден: {}</p>
+            </div>
+        </div>
+        """.format(path),
+        unsafe_allow_html=True,
+    )
+
+def _cached_export(kind: str, key_parts: tuple, build):
+    """
+    Экспорт видео с кэшем на диске: имя файла — sha1 от параметров экспорта, поэтому
+    повторное нажатие с теми же настройками сразу отдаёт готовый файл.
+    build(path) -> bool вызывается только при промахе. Возвращает путь или None.
+    """
+    key = hashlib.sha1("|".join(map(str, (kind,) + tuple(key_parts))).encode("utf-8")).hexdigest()
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    path = os.path.join(EXPORT_CACHE_DIR, f"{kind}_{key}.mp4")
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return path
+
+    # Пишем во временный файл (с расширением .mp4 — по нему OpenCV выбирает контейнер)
+    # и переименовываем атомарно, чтобы недописанный файл не попал в кэш.
+    # Сессии Streamlit — потоки одного процесса, поэтому имя уникально на вызов (mkstemp),
+    # а не на процесс: два одновременных экспорта с одним ключом не пишут в один файл
+    fd, tmp_path = tempfile.mkstemp(dir=EXPORT_CACHE_DIR, prefix=f"{kind}_{key}.", suffix=".part.mp4")
+    os.close(fd)
+    try:
+        if build(tmp_path) and os.path.exists(tmp_path) and os.path.getsize(tmp_path) > 0:
+            os.replace(tmp_path, path)
+        else:
+            return None
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    # Держим в кэше только последние EXPORT_CACHE_MAX файлов
+    cached = sorted(
+        (e for e in os.scandir(EXPORT_CACHE_DIR) if e.name.endswith(".mp4") and ".part." not in e.name),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entry in cached[:-EXPORT_CACHE_MAX]:
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+def _run_export(spinner_text: str, kind: str, key_parts: tuple, build,
+                success_text: str, error_text: str, file_prefix: str):
+    """
+    Экспорт видео по нажатию кнопки: прогресс, кэш на диске и кнопка скачивания.
+    build(path, progress_callback) -> bool создаёт видео при промахе кэша.
+    """
+    with st.spinner(spinner_text):
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+
+        def progress_callback(frame_idx, total_frames):
+            if total_frames > 0:
+                progress = frame_idx / total_frames
+                progress_bar.progress(progress)
+                status_text.text(f"Обработка кадра {frame_idx}/{total_frames}")
+
+        # Создаем видео (или берём готовое из кэша)
+        output_path = _cached_export(kind, key_parts, lambda path: build(path, progress_callback))
+
+        if output_path is not None:
+            st.success(success_text)
+            with open(output_path, "rb") as vf:
+                st.download_button(
+                    label="📥 Скачать видео",
+                    data=vf,
+                    file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
+                    mime="video/mp4",
+                    # Скачивание не должно перезапускать приложение
+                    on_click="ignore",
+                )
+        else:
+            st.error(error_text)
+
+        progress_bar.empty()
+        status_text.empty()
+
+
+def handle_frame_step(step, max_frame_idx: int):
+    """Сдвигает текущий кадр на step (None — переход в начало)"""
+    if step is None:
+        st.session_state.current_frame = 0
+    else:
+        current = st.session_state.current_frame
+        st.session_state.current_frame = min(max_frame_idx, max(0, current + step))
+
+
 def handle_video_mode_change():
     """Отключает все трекеры при переходе в режим видео"""
     st.session_state.track_id = False
@@ -99,13 +368,40 @@ def handle_tracker_change():
             active_found = True
         else:
             st.session_state[key] = False
+CSS_PATH = "assets/styles.css"
+
+# Максимальная ширина кадра, отправляемого в st.image (px)
+DISPLAY_MAX_WIDTH = 960
+
+# Кэш экспортированных видео (между нажатиями кнопок и сессиями)
+EXPORT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "safe_play_exports")
+EXPORT_CACHE_MAX = 8
+
+# Качество JPEG для кадра в покадровом режиме
+JPEG_QUALITY = 85
+
+# Сколько кадров вперёд дочитывает фоновый поток в покадровом режиме
+PREFETCH_AHEAD = 8
+
+# Сколько отрисованных кадров держать в LRU-кэше покадрового режима (на сессию)
+FRAME_CACHE_SIZE = 32
+
 # Маппинг файлов обуви под разные трекеры
 SHOE_LABELS_MAP = {
     "oc_sort": "assets/shoes/oc_sort_basketball_000.shoe_labels.json",
     "bot_sort_reid": "assets/shoes/bot_sort_reid_basketball_000.shoe_labels.json",
 }
 
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False)
+def _load_css(path: str) -> str:
+    """Читает кастомные стили один раз на процесс"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+@st.cache_resource(show_spinner=False)
 def _load_masks():
     """Загружает маски из assets/mask"""
     masks_config = get_masks_config()
@@ -118,6 +414,27 @@ def _load_masks():
 masks = _load_masks()
 masks_config = get_masks_config()
 
+
+@st.cache_resource(show_spinner=False)
+def _mask_overlay(name: str, frame_h: int, frame_w: int):
+    """Таблицы наложения маски под размер кадра: считаются один раз, а не на каждый кадр"""
+    config = masks_config[name]
+    return prepare_mask_overlay(
+        masks.get(name), (frame_h, frame_w), color=config["color"], alpha=config["alpha"]
+    )
+
+
+def _overlay_mask(img, name: str):
+    """Накладывает маску name на кадр: через готовые LUT, иначе обычным смешиванием"""
+    overlay = _mask_overlay(name, img.shape[0], img.shape[1])
+    if overlay is not None:
+        return apply_mask_overlay(img, overlay)
+    mask = masks.get(name)
+    if mask is None:
+        return img
+    config = masks_config[name]
+    return apply_mask_to_frame(img, mask, color=config["color"], alpha=config["alpha"])
+
 # Инициализация состояния приложения
 if 'is_playing' not in st.session_state:
     st.session_state.is_playing = False
@@ -140,39 +457,7 @@ st.set_page_config(
     layout="wide"
 )
 
-st.markdown("""
-    <style>
-    .main {
-        background-color: #f8f9fa;
-    }
-    .stButton>button {
-        background-color: #e9ecef;
-        color: #212529;
-        border: 1px solid #dee2e6;
-        border-radius: 6px;
-        padding: 0.5rem 1rem;
-        font-weight: 500;
-    }
-    .metric-card {
-        background-color: white;
-        padding: 1.5rem;
-        border-radius: 8px;
-        box-shadow: 0 1px 3px rgba(0,0,0,0.1);
-        margin-bottom: 1rem;
-    }
-    .stat-label {
-        color: #6c757d;
-        font-size: 0.875rem;
-        font-weight: 500;
-        margin-bottom: 0.25rem;
-    }
-    .stat-value {
-        color: #212529;
-        font-size: 1.5rem;
-        font-weight: 600;
-    }
-    </style>
-""", unsafe_allow_html=True)
+st.markdown(f"<style>{_load_css(CSS_PATH)}</style>", unsafe_allow_html=True)
 
 # Определение активного трекера и файла разметки
 active_tracker_key = None
@@ -310,9 +595,11 @@ with col2:
     frames = 0
     fps = 0.0
     video_file_path = selected_video_path
-    if os.path.exists(video_file_path):
+    video_mtime = _file_mtime(video_file_path)
+    video_exists = video_mtime is not None
+    if video_exists:
         try:
-            vid_info = get_video_info_safe(video_file_path)
+            vid_info = _cached_video_info(video_file_path, video_mtime)
             st.session_state.video_duration = int(vid_info.get('duration', 0))
             frames = int(vid_info.get('frame_count', 0))
             fps = float(vid_info.get('fps', 0) or 0.0)
@@ -339,25 +626,95 @@ with col2:
             st.rerun()
 
 
-    # Загрузка детекций
-    @st.cache_data(show_spinner=False)
-    def _load_json(path):
+    # Загрузка детекций, треков и обуви: результаты только читаются, поэтому храним их по ссылке
+    # (cache_resource), без pickle на каждом rerun; mtime в ключе сбрасывает кэш при замене файла
+    @st.cache_resource(show_spinner=False)
+    def _load_json(path, mtime):
         return load_detections(path)
 
 
-    @st.cache_data(show_spinner=False)
+    @st.cache_resource(show_spinner=False)
+    def _build_det_index(path, mtime):
+        return build_detections_index(_load_json(path, mtime))
+
+
+    @st.cache_resource(show_spinner=False)
+    def _det_arrays(path, mtime):
+        return build_detections_arrays(_load_json(path, mtime))
+
+
+    def _avg_detections(path, mtime, min_confidence):
+        # Один векторный проход по плоскому массиву уверенностей — кэшировать нечего
+        return avg_detections_from_arrays(_det_arrays(path, mtime), min_confidence=min_confidence)
+
+
+    @st.cache_resource(show_spinner=False)
     def _load_tracks(path):
         return load_mot_tracks(path)
 
 
-    @st.cache_data(show_spinner=False)
+    @st.cache_resource(show_spinner=False)
+    def _build_tracks_index(path):
+        # Индекс только читается — храним по ссылке, без pickle на каждом rerun
+        return build_tracks_index(_load_tracks(path))
+
+
+    @st.cache_resource(show_spinner=False)
+    def _build_tracks_arrays(path):
+        return build_tracks_arrays(_build_tracks_index(path))
+
+
+    @st.cache_resource(show_spinner=False)
     def _load_shoes(path):
         return load_shoe_labels(path)
 
 
-    det_data = _load_json(det_json_path) if os.path.exists(det_json_path) else {"results": []}
-    tracks_data = _load_tracks(tracks_txt_path) if (tracks_txt_path and os.path.exists(tracks_txt_path)) else {
-        "tracks": []}
+    @st.cache_resource(show_spinner=False)
+    def _shoe_summary(path):
+        # Сводка зависит только от файла разметки — считаем один раз, а не на каждый rerun
+        return summarize_all_shoes(_load_shoes(path))
+
+
+    def _run_tracker_export(spinner_text, kind, tracker_key, tracks_path, success_text, error_text, file_prefix):
+        """Экспорт видео с треками выбранного трекера (и обувью, если включена опция)"""
+        shoe_path = SHOE_LABELS_MAP.get(tracker_key, "")
+        with_shoes = bool(
+            st.session_state.get("include_shoes_in_tracker_video", False)
+            and shoe_path and os.path.exists(shoe_path)
+        )
+        include_roi = st.session_state.get("include_roi_zones", True)
+
+        def build(path, progress_callback):
+            tracks = _load_tracks(tracks_path) if os.path.exists(tracks_path) else {"tracks": []}
+            return create_video_with_tracks(
+                video_file_path,
+                tracks,
+                path,
+                progress_callback=progress_callback,
+                shoe_data=_load_shoes(shoe_path) if with_shoes else None,
+                include_roi_zones=include_roi,
+            )
+
+        _run_export(
+            spinner_text,
+            kind,
+            (video_file_path, video_mtime, tracks_path, _file_mtime(tracks_path),
+             with_shoes, _file_mtime(shoe_path), include_roi),
+            build,
+            success_text,
+            error_text,
+            file_prefix,
+        )
+
+
+    det_mtime = _file_mtime(det_json_path)
+    det_exists = det_mtime is not None
+    det_data = _load_json(det_json_path, det_mtime) if det_exists else {"results": []}
+    det_index = _build_det_index(det_json_path, det_mtime) if det_exists else {}
+    tracks_exists = bool(tracks_txt_path) and os.path.exists(tracks_txt_path)
+    tracks_data = _load_tracks(tracks_txt_path) if tracks_exists else {"tracks": []}
+    tracks_index = _build_tracks_index(tracks_txt_path) if tracks_exists else {}
+    tracks_arrays = _build_tracks_arrays(tracks_txt_path) if tracks_exists else build_tracks_arrays({})
     # Загружаем обувь только если выбран трекер
     if active_tracker_key and active_tracker_key in SHOE_LABELS_MAP:
         shoes_json_path = SHOE_LABELS_MAP[active_tracker_key]
@@ -367,7 +724,7 @@ with col2:
 
     # Всегда создаем глобальные переменные для сводки обуви
     if shoes_data.get("labels"):
-        global_shoe_counts, global_shoe_avg_conf = summarize_all_shoes(shoes_data)
+        global_shoe_counts, global_shoe_avg_conf = _shoe_summary(shoes_json_path)
     else:
         global_shoe_counts, global_shoe_avg_conf = {}, {}
 
@@ -379,27 +736,13 @@ with col2:
         except Exception:
             frames = len(det_data.get("results", []))
 
-    # Селектор кадра (если не в режиме видео) - ВЫНЕСЕНО ИЗ БЛОКА else
-    if not video_mode:
-        max_frame_idx = max(0, (frames - 1) if frames else 0)
-        st.session_state.current_frame = st.slider(
-            "Кадр",
-            min_value=0,
-            max_value=max_frame_idx,
-            value=int(st.session_state.get("current_frame", 0)),
-            step=1,
-        )
     # Отрисовка
-    if os.path.exists(video_file_path):
+    if video_exists:
         if video_mode:
 
-            # Показываем выбранное видео (без лишней надписи)
-            if os.path.exists(selected_video_path):
-                with open(selected_video_path, "rb") as vf:
-                    video_bytes = vf.read()
-                st.video(video_bytes, format="video/mp4")
-            else:
-                st.error(f"Файл не найден: {selected_video_path}")
+            # Показываем выбранное видео (без лишней надписи).
+            # Передаём путь: Streamlit отдаёт файл сам, без чтения его целиком в bytes
+            st.video(selected_video_path, format="video/mp4")
 
             # Режим видео с детекциями
             st.markdown("#### Создание видео")
@@ -410,169 +753,46 @@ with col2:
             with col_buttons:
                 # Кнопка для создания видео с детекциями
                 if st.button("Создать видео с детекциями", use_container_width=True):
-                    with st.spinner("Создание видео... Это может занять некоторое время."):
-                        # Создаем временный файл
-                        temp_output = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-                        output_path = temp_output.name
-                        temp_output.close()
-
-                        # Progress bar
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-
-
-                        def progress_callback(frame_idx, total_frames):
-                            if total_frames > 0:
-                                progress = frame_idx / total_frames
-                                progress_bar.progress(progress)
-                                status_text.text(f"Обработка кадра {frame_idx}/{total_frames}")
-
-
-                        # Создаем видео
-                        success = create_video_with_detections(
+                    _run_export(
+                        "Создание видео... Это может занять некоторое время.",
+                        "detections",
+                        (video_file_path, video_mtime, det_json_path, det_mtime,
+                         st.session_state.min_confidence),
+                        lambda path, progress_callback: create_video_with_detections(
                             video_file_path,
                             det_data,
-                            output_path,
+                            path,
                             min_confidence=st.session_state.min_confidence,
                             progress_callback=progress_callback
-                        )
-
-                        if success:
-                            st.success("✅ Видео успешно создано!")
-                            with open(output_path, "rb") as vf:
-                                st.download_button(
-                                    label="📥 Скачать видео",
-                                    data=vf.read(),
-                                    file_name=f"detections_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
-                                    mime="video/mp4"
-                                )
-
-                            # Удаляем временный файл
-                            try:
-                                os.unlink(output_path)
-                            except:
-                                pass
-                        else:
-                            st.error("❌ Ошибка при создании видео")
-
-                        progress_bar.empty()
-                        status_text.empty()
+                        ),
+                        "✅ Видео успешно создано!",
+                        "❌ Ошибка при создании видео",
+                        "detections",
+                    )
 
                 # Кнопка для создания видео с OC-SORT
                 if st.button("Создать видео с OC-SORT", use_container_width=True):
-                    with st.spinner("Создание видео с трекером... Это может занять некоторое время."):
-                        temp_output_tr = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-                        output_path_tr = temp_output_tr.name
-                        temp_output_tr.close()
-
-                        progress_bar_tr = st.progress(0)
-                        status_text_tr = st.empty()
-
-
-                        def progress_callback_tr(frame_idx, total_frames):
-                            if total_frames > 0:
-                                progress = frame_idx / total_frames
-                                progress_bar_tr.progress(progress)
-                                status_text_tr.text(f"Обработка кадра {frame_idx}/{total_frames}")
-
-
-                        # Загружаем треки OC-SORT
-
-                        oc_sort_tracks_path = "assets/tracks/oc_sort_basketball_000.txt"
-                        oc_sort_tracks_data = _load_tracks(oc_sort_tracks_path) if os.path.exists(
-                            oc_sort_tracks_path) else {"tracks": []}
-
-                        # Загружаем данные обуви специально для OC-SORT, если опция включена
-                        oc_sort_shoe_data = None
-                        if st.session_state.get("include_shoes_in_tracker_video", False):
-                            shoe_path = SHOE_LABELS_MAP.get("oc_sort")
-                            if shoe_path and os.path.exists(shoe_path):
-                                oc_sort_shoe_data = _load_shoes(shoe_path)
-
-                        success_tr = create_video_with_tracks(
-                            video_file_path,
-                            oc_sort_tracks_data,
-                            output_path_tr,
-                            progress_callback=progress_callback_tr,
-                            shoe_data=oc_sort_shoe_data,
-                            include_roi_zones=st.session_state.get("include_roi_zones", True),
-                        )
-
-                        if success_tr:
-                            st.success("✅ Видео с трекером успешно создано!")
-                            with open(output_path_tr, "rb") as vf:
-                                st.download_button(
-                                    label="📥 Скачать видео",
-                                    data=vf.read(),
-                                    file_name=f"tracks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
-                                    mime="video/mp4"
-                                )
-                            try:
-                                os.unlink(output_path_tr)
-                            except:
-                                pass
-                        else:
-                            st.error("❌ Ошибка при создании видео с трекером")
-
-                        progress_bar_tr.empty()
-                        status_text_tr.empty()
+                    _run_tracker_export(
+                        "Создание видео с трекером... Это может занять некоторое время.",
+                        "oc_sort",
+                        "oc_sort",
+                        "assets/tracks/oc_sort_basketball_000.txt",
+                        "✅ Видео с трекером успешно создано!",
+                        "❌ Ошибка при создании видео с трекером",
+                        "tracks",
+                    )
 
                 # Кнопка для создания видео с BoT-SORT
                 if st.button("Создать видео с BoT-SORT", use_container_width=True):
-                    with st.spinner("Создание видео с BoT-SORT... Это может занять некоторое время."):
-                        temp_output_bot = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-                        output_path_bot = temp_output_bot.name
-                        temp_output_bot.close()
-
-                        progress_bar_bot = st.progress(0)
-                        status_text_bot = st.empty()
-
-
-                        def progress_callback_bot(frame_idx, total_frames):
-                            if total_frames > 0:
-                                progress = frame_idx / total_frames
-                                progress_bar_bot.progress(progress)
-                                status_text_bot.text(f"Обработка кадра {frame_idx}/{total_frames}")
-
-
-                        # Загружаем треки BoT-SORT
-                        bot_sort_tracks_path = "assets/tracks/bot_sort_reid_basketball_000.txt"
-                        bot_sort_tracks_data = _load_tracks(bot_sort_tracks_path) if os.path.exists(
-                            bot_sort_tracks_path) else {"tracks": []}
-                        # Загружаем данные обуви специально для BoT-SORT, если опция включена
-                        bot_sort_shoe_data = None
-                        if st.session_state.get("include_shoes_in_tracker_video", False):
-                            shoe_path = SHOE_LABELS_MAP.get("bot_sort_reid")
-                            if shoe_path and os.path.exists(shoe_path):
-                                bot_sort_shoe_data = _load_shoes(shoe_path)
-
-                        success_bot = create_video_with_tracks(
-                            video_file_path,
-                            bot_sort_tracks_data,
-                            output_path_bot,
-                            progress_callback=progress_callback_bot,
-                            shoe_data=bot_sort_shoe_data,
-                            include_roi_zones=st.session_state.get("include_roi_zones", True),
-                        )
-
-                        if success_bot:
-                            st.success("✅ Видео с BoT-SORT успешно создано!")
-                            with open(output_path_bot, "rb") as vf:
-                                st.download_button(
-                                    label="📥 Скачать видео",
-                                    data=vf.read(),
-                                    file_name=f"bot_sort_tracks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4",
-                                    mime="video/mp4"
-                                )
-                            try:
-                                os.unlink(output_path_bot)
-                            except:
-                                pass
-                        else:
-                            st.error("❌ Ошибка при создании видео с BoT-SORT")
-
-                        progress_bar_bot.empty()
-                        status_text_bot.empty()
+                    _run_tracker_export(
+                        "Создание видео с BoT-SORT... Это может занять некоторое время.",
+                        "bot_sort",
+                        "bot_sort_reid",
+                        "assets/tracks/bot_sort_reid_basketball_000.txt",
+                        "✅ Видео с BoT-SORT успешно создано!",
+                        "❌ Ошибка при создании видео с BoT-SORT",
+                        "bot_sort_tracks",
+                    )
 
             with col_flags:
                 st.markdown("**Настройки видео:**")
@@ -590,163 +810,33 @@ with col2:
                     value=False,
                     key="include_roi_zones"
                 )
-        else:
-            # Режим покадрового просмотра
-            frame_idx = st.session_state.current_frame
-            bgr = read_frame(video_file_path, frame_idx)
-
-            if bgr is not None:
-                img = bgr
-                yolo_count = None
-                track_count = None
-
-                # Применяем маски если чекбоксы активны
-                if st.session_state.floor:
-                    floor_mask = masks.get("floor")
-                    if floor_mask is not None:
-                        floor_config = masks_config["floor"]
-                        img = apply_mask_to_frame(
-                            img,
-                            floor_mask,
-                            color=floor_config["color"],
-                            alpha=floor_config["alpha"]
-                        )
-
-                if st.session_state.window:
-                    window_mask = masks.get("window")
-                    if window_mask is not None:
-                        window_config = masks_config["window"]
-                        img = apply_mask_to_frame(
-                            img,
-                            window_mask,
-                            color=window_config["color"],
-                            alpha=window_config["alpha"]
-                        )
-                if st.session_state.yolo_enabled:
-                    # читаем детекции с учетом фильтра уверенности и рисуем боксы
-                    dets = get_frame_detections(
-                        det_data,
-                        frame_idx,
-                        min_confidence=st.session_state.min_confidence
-                    )
-                    yolo_count = len(dets)
-                    img = draw_bboxes_on_image(img, dets)
-
-                if active_tracker_key is not None:
-                    tracks = get_frame_tracks(tracks_data, frame_idx) if 'tracks_data' in locals() else []
-                    track_count = len(tracks)
-
-                    # Build short track history window for smooth trail drawing in frame-by-frame mode
-                    history_len = 25
-                    start_f = max(0, frame_idx - history_len + 1)
-                    track_history = {}
-                    if 'tracks_data' in locals():
-                        for f in range(start_f, frame_idx + 1):
-                            f_tracks = get_frame_tracks(tracks_data, f)
-                            for tr in f_tracks:
-                                tid = tr.get("id")
-                                bbox = tr.get("bbox", {})
-                                try:
-                                    cx = int((bbox.get("x1", 0) + bbox.get("x2", 0)) / 2)
-                                    cy = int(bbox.get("y2", 0))  # bottom center
-                                except Exception:
-                                    continue
-                                if tid not in track_history:
-                                    from collections import deque
-
-                                    track_history[tid] = deque(maxlen=history_len)
-                                track_history[tid].append((cx, cy))
-
-                    # Получаем информацию об обуви для текущего кадра
-                    frame_shoes = {}
-                    if st.session_state.shoe1 and active_tracker_key and 'shoes_data' in locals():
-                        try:
-                            from utils.shoe_utils import get_tracker_shoes_static
-
-                            frame_shoes = get_tracker_shoes_static(shoes_data)
-                        except Exception as e:
-                            print(f"Error getting shoe data: {e}")
-
-                    # Передаем информацию об обуви в функцию отрисовки
-                    img = draw_tracks_on_image(img, tracks, track_history, frame_shoes)
-
-                rgb = img[:, :, ::-1]
-
-                st.image(rgb, use_container_width=True)
-            else:
-                st.warning("⚠️ Не удалось прочитать кадр")
-
-    else:
+    elif video_mode:
         # Заглушка, если видео не найдено
-        st.markdown(
-            """
-            <div style='background-color: #e9ecef; height: 400px; border-radius: 8px; 
-            display: flex; align-items: center; justify-content: center; color: #6c757d;'>
-                <div style='text-align: center;'>
-                    <h2>📹 Video Not Found</h2>
-                    <p>Видеофайл не найден: {}</p>
-                </div>
-            </div>
-            """.format(selected_video_path),
-            unsafe_allow_html=True,
-        )
-    # Кнопки навигации и управления - ПОКАЗЫВАТЬ ТОЛЬКО В ПОКАДРОВОМ РЕЖИМЕ
-    if not video_mode:
-        control_cols = st.columns([1.5, 2, 1.5, 1.5, 1.5, 1.5, 2])
-
-        with control_cols[1]:
-            if st.button("⏮️ Начало"):
-                st.session_state.current_frame = 0
-                st.rerun()
-
-        with control_cols[2]:
-            if st.button("◀️ -10"):
-                st.session_state.current_frame = max(0, st.session_state.current_frame - 10)
-                st.rerun()
-
-        with control_cols[3]:
-            if st.button("◀️ -1"):
-                st.session_state.current_frame = max(0, st.session_state.current_frame - 1)
-                st.rerun()
-
-        with control_cols[4]:
-            if st.button("▶️ +1"):
-                max_frame_idx = max(0, (frames - 1) if frames else 0)
-                st.session_state.current_frame = min(max_frame_idx, st.session_state.current_frame + 1)
-                st.rerun()
-
-        with control_cols[5]:
-            if st.button("⏭️ +10"):
-                max_frame_idx = max(0, (frames - 1) if frames else 0)
-                st.session_state.current_frame = min(max_frame_idx, st.session_state.current_frame + 10)
-                st.rerun()
+        _video_not_found(selected_video_path)
 
 # Правая панель - Статистика
 with col3:
     st.markdown("### Статистика")
 
     # Статистика видео
-    if os.path.exists(video_file_path):
+    if video_exists:
         try:
-            video_info = get_video_info_safe(video_file_path)
-            width = int(video_info.get('width') or 0)
-            height = int(video_info.get('height') or 0)
-            fps_val = float(video_info.get('fps') or 0)
-            duration_sec = int(video_info.get('duration') or 0)
+            video_info = _cached_video_info(video_file_path, video_mtime)
             frames_stat = int(video_info.get('frame_count') or 0)
 
             # Среднее число детекций на кадр из JSON с учетом фильтра
             try:
-                avg_det = compute_avg_detections(
-                    det_data,
-                    min_confidence=st.session_state.min_confidence if st.session_state.yolo_enabled else None
-                ) if 'det_data' in locals() else 0.0
+                avg_det = _avg_detections(
+                    det_json_path,
+                    det_mtime,
+                    st.session_state.min_confidence if st.session_state.yolo_enabled else None
+                ) if det_exists else 0.0
             except Exception:
                 avg_det = 0.0
 
             # Среднее число треков на кадр из MOT-треков
             try:
-                tracks_list = tracks_data.get("tracks", []) if 'tracks_data' in locals() else []
+                tracks_list = tracks_data.get("tracks", [])
                 if frames_stat and frames_stat > 0:
                     total_frames_for_avg = frames_stat
                 else:
@@ -760,52 +850,17 @@ with col3:
                 avg_trk = 0.0
 
             # Форматирование
-            fps_str = f"{fps_val:.2f}" if fps_val > 0 else "—"
-            dur_str = f"{duration_sec} сек" if duration_sec > 0 else "—"
-            res_str = f"{width} × {height}" if width > 0 and height > 0 else "—"
-            frames_str = f"{frames_stat}" if frames_stat > 0 else "—"
             avg_det_str = f"{avg_det:.2f}" if avg_det > 0 else "—"
             avg_trk_str = f"{avg_trk:.2f}" if avg_trk > 0 else "—"
 
-            # Динамически собираем HTML, скрывая отсутствующие поля
-            rows = []
-            rows.append(f"""
-                <div style='color: #6c757d; font-size: 0.875rem; margin-bottom: 0.5rem;'>
-                    <strong>Разрешение:</strong>
-                    <span style='float: right; color: #212529;'>{res_str}</span>
-                </div>""")
-            rows.append(f"""
-                <div style='color: #6c757d; font-size: 0.875rem; margin-bottom: 0.5rem;'>
-                    <strong>FPS:</strong>
-                    <span style='float: right; color: #212529;'>{fps_str}</span>
-                </div>""")
-            rows.append(f"""
-                <div style='color: #6c757d; font-size: 0.875rem; margin-bottom: 0.5rem;'>
-                    <strong>Длительность:</strong>
-                    <span style='float: right; color: #212529;'>{dur_str}</span>
-                </div>""")
-            rows.append(f"""
-                <div style='color: #6c757d; font-size: 0.875rem; margin-bottom: 0.5rem;'>
-                    <strong>Кадров:</strong>
-                    <span style='float: right; color: #212529;'>{frames_str}</span>
-                </div>""")
-            rows.append(f"""
-                <div style='color: #6c757d; font-size: 0.875rem; margin-bottom: 0.5rem;'>
-                    <strong>Сред. детекций/кадр:</strong>
-                    <span style='float: right; color: #212529;'>{avg_det_str}</span>
-                </div>""")
-            rows.append(f"""
-                <div style='color: #6c757d; font-size: 0.875rem; margin-bottom: 0.5rem;'>
-                    <strong>Сред. треков/кадр:</strong>
-                    <span style='float: right; color: #212529;'>{avg_trk_str}</span>
-                </div>""")
-
-            html = "\n".join(rows)
+            # Статичные строки берём из кэша, динамические (зависят от фильтров) дописываем
             st.markdown(f"""
                 <div class='metric-card'>
                     <div class='stat-label'> Информация о видео</div>
                     <div style='margin-top: 0.75rem;'>
-                        {html}
+                        {_video_info_html(video_file_path, video_mtime)}
+                        {_stat_row("Сред. детекций/кадр", avg_det_str)}
+                        {_stat_row("Сред. треков/кадр", avg_trk_str)}
                     </div>
                 </div>
             """, unsafe_allow_html=True)
@@ -818,60 +873,14 @@ with col3:
                     </div>
                 </div>
             """, unsafe_allow_html=True)
-    try:
-        cur_f = int(st.session_state.get('current_frame', 0))
-        st.markdown(f"""
-                <div class='metric-card'>
-                    <div style='text-align: center; color: #212529; font-weight: 600; margin-bottom: 0.5rem;'>🔘 Кадр: {cur_f} </div>
-            """, unsafe_allow_html=True)
-        # Детекции YOLO на текущем кадре
-        cur_dets = get_frame_detections(
-            det_data,
-            cur_f,
-            min_confidence=st.session_state.min_confidence if st.session_state.yolo_enabled else None
-        ) if 'det_data' in locals() else []
-
-        conf_info = f" (conf ≥ {st.session_state.min_confidence:.2f})" if st.session_state.yolo_enabled and st.session_state.min_confidence > 0 else ""
+    # Карточки текущего кадра заполняет _frame_stats (в покадровом режиме — из фрагмента)
+    frame_stats_slot = st.empty()
 
-        st.markdown(f"""
-            <div class='metric-card'>
-                <div style='color: #6c757d; font-size: 0.875rem; margin-top: 0.5rem;'>
-                    <div>YOLO детекций: {conf_info} <span style='float: right; color: #212529;'>{len(cur_dets)}</span></div>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-    except Exception:
-        pass
-    # Трекеры — количество треков на текущем кадре + расширенная статистика (показываем только при выбранном трекере)
-    try:
-        if 'active_tracker_key' in locals() and active_tracker_key is not None:
-            cur_f_tr = int(st.session_state.get('current_frame', 0))
-            cur_tracks = get_frame_tracks(tracks_data, cur_f_tr) if 'tracks_data' in locals() else []
-
-            # Заголовок с числом треков на текущем кадре
-            tracker_title = active_tracker_label + " треков" if active_tracker_label else "Треков"
-            st.markdown(f"""
-                <div class='metric-card'>
-                    <div style='color: #6c757d; font-size: 0.875rem; margin-top: 0.5rem;'>
-                        <div>{tracker_title}: <span style='float: right; color: #212529;'>{len(cur_tracks)}</span></div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-
-    except Exception:
-        pass
     try:
         # Добавляем таблицу с метриками
         with st.expander("Метрики трекеров"):
-            # Формируем таблицу
-            metrics = pd.DataFrame({
-                'Трекер': ['OC Sort', 'BoT Sort'],
-                'IDF1': [0.49, 0.49],
-                'MOTA': [0.43, 0.43],
-                'Switches':[92, 63]
-            })
             st.dataframe(
-                metrics,
+                _tracker_metrics_table(),
                 hide_index=True,
                 use_container_width=True
             )
@@ -879,39 +888,15 @@ with col3:
         pass
     # Обувь на видео
     try:
-        # Проверка существования shoes_data
-        shoes_data_available = (
-                'shoes_data' in locals() or 'shoes_data' in globals() or
-                'shoes_data' in st.session_state
-        )
-
-        if shoes_data_available and shoes_data and shoes_data.get("labels"):
-            counts, avg_conf = summarize_all_shoes(shoes_data)
+        # shoes_data всегда задан при загрузке данных (пустой, если трекер не выбран)
+        if shoes_data.get("labels"):
+            counts, avg_conf = global_shoe_counts, global_shoe_avg_conf
         else:
             counts, avg_conf = {}, {}
 
         if counts:
-            # Формируем HTML-список: Класс — Кол-во (ср. уверенность)
-            items = []
-            for cls in sorted(counts.keys()):
-                cnt = counts.get(cls, 0)
-                conf = avg_conf.get(cls, None)
-                if conf is not None:
-                    items.append(
-                        f"<div>{cls}: <span style='float: right; color: #212529;'>{cnt} (avg {conf:.2f})</span></div>")
-                else:
-                    items.append(f"<div>{cls}: <span style='float: right; color: #212529;'>{cnt}</span></div>")
-            items_html = "\n".join(items)
-
-            # Создаем данные для столбчатой диаграммы в процентах
-            total = sum(counts.values())
-
-            # Подготавливаем данные для графика
-            chart_data = pd.DataFrame({
-                'Тип обуви': list(counts.keys()),
-                'Процент': [(count / total) * 100 for count in counts.values()],
-                'Количество': list(counts.values())
-            }).sort_values('Процент', ascending=False)
+            # Данные для столбчатой диаграммы в процентах (кэшируются по counts)
+            chart_data = _shoes_chart_data(counts)
 
             # Создаем столбчатую диаграмму с помощью Streamlit
             st.markdown("<span style='font-size: 1.0em; color: #6c757d;'>Распределение обуви по типам (%)</span>",
@@ -926,11 +911,9 @@ with col3:
 
             # Добавляем таблицу с подробностями под графиком
             with st.expander("Детали распределения"):
-                # Форматируем проценты
-                chart_data_display = chart_data.copy()
-                chart_data_display['Процент'] = chart_data_display['Процент'].round(2).astype(str) + '%'
+                # Проценты уже отформатированы в кэше
                 st.dataframe(
-                    chart_data_display[['Тип обуви', 'Количество', 'Процент']],
+                    _shoes_table_data(counts),
                     hide_index=True,
                     use_container_width=True
                 )
@@ -953,4 +936,180 @@ with col3:
         # Сообщение об ошибке для графика
         st.error(f"Ошибка при построении диаграммы: {str(e)}")
 
-    st.markdown("</div>", unsafe_allow_html=True)
+
+def _frame_stats(cur_f: int, cur_dets=None):
+    """Карточки текущего кадра в правой панели (кадр, детекции YOLO, треки).
+
+    Все карточки уходят одним st.markdown — один элемент на перерисовку вместо трёх.
+    """
+    cards = []
+    try:
+        cards.append(f"""
+                <div class='metric-card'>
+                    <div style='text-align: center; color: #212529; font-weight: 600; margin-bottom: 0.5rem;'>🔘 Кадр: {cur_f} </div>
+                </div>
+            """)
+        # Настройки фильтра читаем из session_state один раз
+        yolo_on = st.session_state.yolo_enabled
+        min_conf = st.session_state.min_confidence
+
+        # Детекции YOLO на текущем кадре (если кадр уже отрисован — берём готовый список)
+        if cur_dets is None:
+            cur_dets = filter_detections(
+                det_index.get(cur_f, []),
+                min_confidence=min_conf if yolo_on else None
+            )
+
+        conf_info = f" (conf ≥ {min_conf:.2f})" if yolo_on and min_conf > 0 else ""
+
+        cards.append(f"""
+            <div class='metric-card'>
+                <div style='color: #6c757d; font-size: 0.875rem; margin-top: 0.5rem;'>
+                    <div>YOLO детекций: {conf_info} <span class='info-value'>{len(cur_dets)}</span></div>
+                </div>
+            </div>
+        """)
+    except Exception:
+        pass
+    # Трекеры — количество треков на текущем кадре + расширенная статистика (показываем только при выбранном трекере)
+    try:
+        if active_tracker_key is not None:
+            cur_tracks = tracks_index.get(cur_f, [])
+
+            # Заголовок с числом треков на текущем кадре
+            tracker_title = active_tracker_label + " треков" if active_tracker_label else "Треков"
+            cards.append(f"""
+                <div class='metric-card'>
+                    <div style='color: #6c757d; font-size: 0.875rem; margin-top: 0.5rem;'>
+                        <div>{tracker_title}: <span class='info-value'>{len(cur_tracks)}</span></div>
+                    </div>
+                </div>
+            """)
+
+    except Exception:
+        pass
+    # У карточек разный отступ в исходнике: выравниваем каждую, иначе после общего
+    # dedent карточка с лишним отступом станет блоком кода в markdown
+    frame_stats_slot.markdown(
+        "\n".join(textwrap.dedent(card).strip() for card in cards), unsafe_allow_html=True
+    )
+
+
+@st.fragment
+def _frame_view():
+    """Покадровый просмотр: слайдер, кадр и кнопки навигации.
+
+    Вынесен во фрагмент: прокрутка и кнопки перезапускают только его, а не всю
+    страницу — левая панель и статистика видео не пересобираются.
+    """
+    max_frame_idx = max(0, (frames - 1) if frames else 0)
+    st.session_state.current_frame = st.slider(
+        "Кадр",
+        min_value=0,
+        max_value=max_frame_idx,
+        value=int(st.session_state.get("current_frame", 0)),
+        step=1,
+    )
+    image_slot = st.empty()
+    # Детекции текущего кадра, посчитанные при отрисовке (переиспользуются в статистике)
+    cur_dets = None
+    if video_exists:
+        # Режим покадрового просмотра
+        frame_idx = st.session_state.current_frame
+        yolo_on = st.session_state.yolo_enabled
+        min_conf = st.session_state.min_confidence
+        show_floor = st.session_state.floor
+        show_window = st.session_state.window
+
+        # LRU-кэш готовых кадров: при повторном заходе на кадр с теми же
+        # настройками пропускаем декодирование и отрисовку
+        frame_cache = st.session_state.setdefault("_frame_cache", OrderedDict())
+        render_key = (
+            video_file_path,
+            frame_idx,
+            yolo_on,
+            min_conf,
+            show_floor,
+            show_window,
+            active_tracker_key,
+            st.session_state.shoe1,
+        )
+        shown = frame_cache.get(render_key)
+        if shown is not None:
+            frame_cache.move_to_end(render_key)
+        else:
+            bgr = read_frame_cached(video_file_path, frame_idx)
+
+            if bgr is not None:
+                img = bgr
+
+                # Применяем маски если чекбоксы активны
+                if show_floor:
+                    img = _overlay_mask(img, "floor")
+
+                if show_window:
+                    img = _overlay_mask(img, "window")
+                if yolo_on:
+                    # читаем детекции с учетом фильтра уверенности и рисуем боксы
+                    dets = filter_detections(
+                        det_index.get(frame_idx, []),
+                        min_confidence=min_conf
+                    )
+                    cur_dets = dets
+                    img = draw_bboxes_on_image(img, dets, out=img)
+
+                if active_tracker_key is not None:
+                    tracks = tracks_index.get(frame_idx, [])
+
+                    # Build short track history window for smooth trail drawing in frame-by-frame mode
+                    history_len = 25
+                    start_f = max(0, frame_idx - history_len + 1)
+                    track_history = track_history_window(tracks_arrays, start_f, frame_idx, history_len)
+
+                    # Получаем информацию об обуви для текущего кадра
+                    frame_shoes = {}
+                    if st.session_state.shoe1 and active_tracker_key:
+                        try:
+                            from utils.shoe_utils import get_tracker_shoes_static
+
+                            frame_shoes = get_tracker_shoes_static(shoes_data)
+                        except Exception as e:
+                            st.warning(f"⚠️ Не удалось получить данные об обуви: {e}")
+
+                    # Передаем информацию об обуви в функцию отрисовки
+                    img = draw_tracks_on_image(img, tracks, track_history, frame_shoes)
+
+                # Браузер всё равно ужмёт кадр под ширину колонки — уменьшаем заранее
+                # и сразу кодируем в JPEG из BGR: st.image отдаёт готовые байты как есть
+                small = fit_to_width(img, DISPLAY_MAX_WIDTH)
+                shown = encode_jpeg(small, JPEG_QUALITY)
+                if shown is None:
+                    shown = bgr_to_rgb(small)
+                frame_cache[render_key] = shown
+                if len(frame_cache) > FRAME_CACHE_SIZE:
+                    frame_cache.popitem(last=False)
+
+        if shown is not None:
+            image_slot.image(shown, use_container_width=True, output_format="JPEG")
+        else:
+            image_slot.warning("⚠️ Не удалось прочитать кадр")
+    else:
+        # Заглушка, если видео не найдено
+        _video_not_found(selected_video_path)
+
+    # Кнопки навигации и управления: кадр меняется в колбэке до перезапуска фрагмента
+    control_cols = st.columns([1.5, 2, 1.5, 1.5, 1.5, 1.5, 2])
+    nav_buttons = [("⏮️ Начало", None), ("◀️ -10", -10), ("◀️ -1", -1), ("▶️ +1", 1), ("⏭️ +10", 10)]
+    for col, (label, step) in zip(control_cols[1:6], nav_buttons):
+        with col:
+            st.button(label, on_click=handle_frame_step, args=(step, max_frame_idx))
+
+    _frame_stats(int(st.session_state.get("current_frame", 0)), cur_dets)
+
+
+# Покадровый режим рисуется фрагментом в центральной колонке
+if video_mode:
+    _frame_stats(int(st.session_state.get("current_frame", 0)))
+else:
+    with col2:
+        _frame_view()
@@ -14,13 +14,11 @@ def load_mask(mask_path):
     return mask
 
 
-def apply_mask_to_frame(frame, mask, color=(0, 255, 0), alpha=0.3):
+def _colored_mask(mask, color):
     """
-    Накладывает маску на кадр с указанным цветом и прозрачностью
+    Приводит маску к BGRA: каналы BGR залиты цветом, альфа — из маски.
+    Возвращает None для неподдерживаемой формы маски.
     """
-    if mask is None:
-        return frame
-
     # Приводим маску к формату RGBA (4 канала)
     if mask.ndim == 2:
         # Одноканальная маска (градации серого) — используем как альфа-канал
@@ -42,10 +40,10 @@ def apply_mask_to_frame(frame, mask, color=(0, 255, 0), alpha=0.3):
             mask_rgba = mask
         else:
             # Неожиданное число каналов — просто не накладываем маску
-            return frame
+            return None
     else:
         # Неподдерживаемая форма маски
-        return frame
+        return None
 
     # Создаем цветную маску на основе RGBA
     colored_mask = np.zeros_like(mask_rgba)
@@ -53,6 +51,20 @@ def apply_mask_to_frame(frame, mask, color=(0, 255, 0), alpha=0.3):
     colored_mask[:, :, 1] = color[1]  # G
     colored_mask[:, :, 2] = color[2]  # R
     colored_mask[:, :, 3] = mask_rgba[:, :, 3]  # Alpha
+    return colored_mask
+
+
+def apply_mask_to_frame(frame, mask, color=(0, 255, 0), alpha=0.3):
+    """
+    Накладывает маску на кадр с указанным цветом и прозрачностью
+    """
+    if mask is None:
+        return frame
+
+    colored_mask = _colored_mask(mask, color)
+    if colored_mask is None:
+        # Неподдерживаемая форма маски
+        return frame
 
     # Изменяем размер маски под размер кадра
     h, w = frame.shape[:2]
@@ -70,6 +82,60 @@ def apply_mask_to_frame(frame, mask, color=(0, 255, 0), alpha=0.3):
     return frame
 
 
+def prepare_mask_overlay(mask, frame_shape, color=(0, 255, 0), alpha=0.3, max_levels=16):
+    """
+    Заранее считает наложение маски для фиксированных размера кадра, цвета и прозрачности.
+
+    Цвет маски постоянен, поэтому результат apply_mask_to_frame в пикселе зависит только
+    от уровня альфы и исходного значения канала: для каждого ненулевого уровня строится
+    таблица 256 -> 256 (cv2.LUT) по той же формуле, плюс область пикселей этого уровня.
+    Пиксели с нулевой альфой не меняются. Возвращает список уровней для
+    apply_mask_overlay или None, если маски нет или уровней больше max_levels
+    (тогда дешевле обычный apply_mask_to_frame).
+    """
+    if mask is None:
+        return None
+    colored_mask = _colored_mask(mask, color)
+    if colored_mask is None:
+        return None
+
+    h, w = frame_shape[:2]
+    alpha_resized = cv2.resize(colored_mask, (w, h))[:, :, 3]
+    levels = np.unique(alpha_resized)
+    levels = levels[levels > 0]
+    if len(levels) > max_levels:
+        return None
+
+    values = np.arange(256, dtype=np.uint8)
+    bgr = np.asarray(color, dtype=np.uint8)
+    overlay = []
+    for level in levels:
+        pixels = alpha_resized == level
+        rows = np.flatnonzero(pixels.any(axis=1))
+        cols = np.flatnonzero(pixels.any(axis=0))
+        y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+        # Та же формула и тот же порядок операций, что и в apply_mask_to_frame
+        mask_alpha = np.full(1, level, dtype=np.uint8) / 255.0
+        lut = np.empty((256, 1, 3), dtype=np.uint8)
+        for c in range(3):
+            lut[:, 0, c] = (values * (1 - mask_alpha * alpha) +
+                            bgr[c:c + 1] * mask_alpha * alpha)
+        overlay.append((y0, y1, x0, x1, pixels[y0:y1, x0:x1, None], lut))
+    return overlay
+
+
+def apply_mask_overlay(frame, overlay):
+    """
+    Накладывает маску, подготовленную prepare_mask_overlay, на кадр (in-place).
+    Результат совпадает с apply_mask_to_frame попиксельно.
+    """
+    for y0, y1, x0, x1, pixels, lut in overlay:
+        roi = frame[y0:y1, x0:x1]
+        np.copyto(roi, cv2.LUT(roi, lut), where=pixels)
+    return frame
+
+
 def get_masks_config():
     """
     Возвращает конфигурацию масок
@@ -34,13 +34,9 @@ def draw_text(img, text, org, font_height=20, color=(255, 255, 255), thickness=-
     :param color: цвет текста (B, G, R) - формат OpenCV
     :param thickness: толщина (в PIL игнорируется или эмулируется, здесь пропущен для простоты)
     """
-    # 1. Конвертируем BGR (OpenCV) -> RGB (PIL)
-    img_pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-    draw = ImageDraw.Draw(img_pil)
-
     font = get_pil_font(font_height)
 
-    # 2. Вычисляем размер текста для корректировки координат
+    # 1. Вычисляем размер текста для корректировки координат
     # PIL рисует от верхнего левого угла, а OpenCV принимает нижний левый (baseline)
     bbox = font.getbbox(text)  # (left, top, right, bottom)
     text_h = bbox[3] - bbox[1]
@@ -50,12 +46,28 @@ def draw_text(img, text, org, font_height=20, color=(255, 255, 255), thickness=-
     # (Небольшая корректировка font_height * 0.2 для учета "хвостиков" букв типа 'щ', 'р', 'у')
     y_top = y - text_h - int(font_height * 0.2)
 
-    # 3. Рисуем текст. PIL требует RGB, а входной color в BGR.
+    # 2. Текст меняет только пиксели внутри своего bbox — конвертируем через PIL
+    # лишь эту область кадра (с запасом), а не весь кадр
+    h, w = img.shape[:2]
+    margin = 2
+    x0 = max(0, x + bbox[0] - margin)
+    y0 = max(0, y_top + bbox[1] - margin)
+    x1 = min(w, x + bbox[2] + margin)
+    y1 = min(h, y_top + bbox[3] + margin)
+    if x0 >= x1 or y0 >= y1:
+        return
+    roi = img[y0:y1, x0:x1]
+
+    # 3. Конвертируем BGR (OpenCV) -> RGB (PIL)
+    img_pil = Image.fromarray(cv2.cvtColor(roi, cv2.COLOR_BGR2RGB))
+    draw = ImageDraw.Draw(img_pil)
+
+    # 4. Рисуем текст. PIL требует RGB, а входной color в BGR.
     b, g, r = color
-    draw.text((x, y_top), text, font=font, fill=(r, g, b))
+    draw.text((x - x0, y_top - y0), text, font=font, fill=(r, g, b))
 
-    # 4. Конвертируем обратно RGB -> BGR и обновляем исходный массив in-place
-    img[:] = cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+    # 5. Конвертируем обратно RGB -> BGR и обновляем исходный массив in-place
+    roi[:] = cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
 
 
 def text_size(text, font_height=20):
@@ -2,7 +2,8 @@ import os
 from typing import Dict, Any, List, Tuple, Optional
 from collections import deque
 from .shoe_utils import summarize_frame_shoes, draw_shoes_summary_on_image, get_tracker_shoes_static
-from .mask_utils import get_masks_config, load_mask, apply_mask_to_frame
+from .mask_utils import get_masks_config, load_mask, apply_mask_to_frame, apply_mask_overlay, prepare_mask_overlay
+from .yolo_utils import open_video_capture, open_video_writer
 import numpy as np
 
 
@@ -26,6 +27,11 @@ def load_mot_tracks(txt_path: str) -> Dict[str, Any]:
     if not os.path.exists(txt_path):
         return data
 
+    fast = _load_mot_tracks_fast(txt_path)
+    if fast is not None:
+        data["tracks"] = fast
+        return data
+
     tracks: List[Dict[str, Any]] = []
     try:
         with open(txt_path, "r", encoding="utf-8") as f:
@@ -72,6 +78,43 @@ def load_mot_tracks(txt_path: str) -> Dict[str, Any]:
     return data
 
 
+def _load_mot_tracks_fast(txt_path: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Vectorized parser for well-formed comma-separated MOT files.
+
+    Parses all columns in C via np.loadtxt and converts the boxes with array ops;
+    the records are identical to the line-by-line parser in load_mot_tracks().
+    Returns None if the file is ragged, whitespace-separated or otherwise
+    unusual, so the caller falls back to the tolerant parser.
+    """
+    try:
+        arr = np.loadtxt(txt_path, delimiter=",", comments="#", ndmin=2, encoding="utf-8")
+    except Exception:
+        return None
+    if arr.shape[1] < 6 or not np.isfinite(arr[:, :6]).all():
+        return None
+
+    frames = np.maximum(arr[:, 0].astype(np.int64) - 1, 0).tolist()
+    ids = arr[:, 1].astype(np.int64).tolist()
+    x, y, w, h = arr[:, 2], arr[:, 3], arr[:, 4], arr[:, 5]
+    # np.rint rounds half to even, like round() in the line parser
+    x1 = np.rint(x).astype(np.int64).tolist()
+    y1 = np.rint(y).astype(np.int64).tolist()
+    x2 = np.rint(x + w).astype(np.int64).tolist()
+    y2 = np.rint(y + h).astype(np.int64).tolist()
+    confs = arr[:, 6].tolist() if arr.shape[1] >= 7 else [None] * len(frames)
+
+    return [
+        {
+            "frame": f,
+            "id": i,
+            "bbox": {"x1": a, "y1": b, "x2": c, "y2": d},
+            "conf": cf,
+        }
+        for f, i, a, b, c, d, cf in zip(frames, ids, x1, y1, x2, y2, confs)
+    ]
+
+
 def get_frame_tracks(data: Dict[str, Any], frame_idx: int) -> List[Dict[str, Any]]:
     """
     Return list of tracks for a given 0-based frame index.
@@ -95,6 +138,87 @@ def get_frame_tracks(data: Dict[str, Any], frame_idx: int) -> List[Dict[str, Any
     return out
 
 
+def build_tracks_index(data: Dict[str, Any]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Group tracks by 0-based frame index for O(1) per-frame lookup.
+
+    index.get(frame_idx, []) holds the same records, in the same order, as
+    get_frame_tracks(data, frame_idx). Records are shared: treat them as read-only.
+    """
+    index: Dict[int, List[Dict[str, Any]]] = {}
+    for item in data.get("tracks", []) or []:
+        try:
+            frame = int(item.get("frame", -1))
+            rec = {
+                "id": int(item.get("id")),
+                "bbox": dict(item.get("bbox", {})),
+                "conf": item.get("conf"),
+            }
+        except Exception:
+            continue
+        index.setdefault(frame, []).append(rec)
+    return index
+
+
+def build_tracks_arrays(index: Dict[int, List[Dict[str, Any]]]) -> Dict[str, np.ndarray]:
+    """
+    Struct-of-arrays view of a build_tracks_index() result for trail assembly.
+
+    Returns {"frame", "id", "cx", "cy"} int64 arrays ordered by frame (and by the
+    original order within a frame); (cx, cy) is the bottom-center of the bbox.
+    """
+    frames, ids, cxs, cys = [], [], [], []
+    for frame in sorted(index):
+        for tr in index[frame]:
+            bbox = tr.get("bbox", {})
+            try:
+                cx = int((bbox.get("x1", 0) + bbox.get("x2", 0)) / 2)
+                cy = int(bbox.get("y2", 0))  # bottom center
+            except Exception:
+                continue
+            frames.append(frame)
+            ids.append(tr.get("id"))
+            cxs.append(cx)
+            cys.append(cy)
+    return {
+        "frame": np.asarray(frames, dtype=np.int64),
+        "id": np.asarray(ids, dtype=np.int64),
+        "cx": np.asarray(cxs, dtype=np.int64),
+        "cy": np.asarray(cys, dtype=np.int64),
+    }
+
+
+def track_history_window(
+        arrays: Dict[str, np.ndarray],
+        start_frame: int,
+        end_frame: int,
+        maxlen: int = 25
+) -> Dict[int, np.ndarray]:
+    """
+    Trail points {track_id: int64 array (K, 2) of (cx, cy)} over frames start_frame..end_frame.
+
+    The window is one searchsorted slice of the frame-sorted arrays; points are
+    grouped by id with a stable sort, so each trail keeps frame order. At most the
+    last `maxlen` points are kept per id, like a deque(maxlen=maxlen).
+    """
+    frame = arrays["frame"]
+    lo = int(np.searchsorted(frame, start_frame, side="left"))
+    hi = int(np.searchsorted(frame, end_frame, side="right"))
+    if hi <= lo:
+        return {}
+    ids = arrays["id"][lo:hi]
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    pts = np.stack((arrays["cx"][lo:hi][order], arrays["cy"][lo:hi][order]), axis=1)
+    bounds = np.flatnonzero(np.diff(ids)) + 1
+    starts = [0] + bounds.tolist()
+    ends = bounds.tolist() + [len(ids)]
+    return {
+        int(ids[s]): pts[max(s, e - maxlen):e]
+        for s, e in zip(starts, ends)
+    }
+
+
 def pleasant_palette() -> List[Tuple[int, int, int]]:
     """A fixed set of pleasant BGR colors (muted but distinct)."""
     # BGR tuples chosen to be eye-pleasing on light background
@@ -121,6 +245,32 @@ def id_color(track_id: int, palette: Optional[List[Tuple[int, int, int]]] = None
     return pal[idx]
 
 
+def _blend_filled_rect(
+        image: np.ndarray,
+        pt1: Tuple[int, int],
+        pt2: Tuple[int, int],
+        color: Tuple[int, int, int],
+        alpha: float
+) -> None:
+    """
+    Blend a filled rectangle into image in place: alpha * color + (1 - alpha) * image.
+
+    Same pixels as drawing the rectangle on a full-frame copy and addWeighted-ing it
+    back, but only the clipped rectangle region is copied and blended.
+    """
+    import cv2
+
+    h, w = image.shape[:2]
+    xa, xb = max(0, min(pt1[0], pt2[0])), min(w - 1, max(pt1[0], pt2[0]))
+    ya, yb = max(0, min(pt1[1], pt2[1])), min(h - 1, max(pt1[1], pt2[1]))
+    if xa > xb or ya > yb:
+        return
+    roi = image[ya:yb + 1, xa:xb + 1]
+    fill = np.empty_like(roi)
+    fill[:] = color
+    roi[:] = cv2.addWeighted(fill, alpha, roi, 1.0 - alpha, 0)
+
+
 def draw_tracks_on_image(
         image_bgr: np.ndarray,
         tracks: List[Dict[str, Any]],
@@ -189,9 +339,7 @@ def draw_tracks_on_image(
         y_bg2 = y1 - 2
 
         # semi-transparent background for legibility
-        overlay = out.copy()
-        cv2.rectangle(overlay, (x_bg1, y_bg1), (x_bg2, y_bg2), color, thickness=-1)
-        cv2.addWeighted(overlay, 0.25, out, 0.75, 0, out)
+        _blend_filled_rect(out, (x_bg1, y_bg1), (x_bg2, y_bg2), color, 0.25)
 
         # text on top (org is bottom-left of text)
         txt_org = (x_bg1 + pad, y_bg2 - pad)
@@ -227,9 +375,7 @@ def draw_tracks_on_image(
                 shoe_bg_x2 = img_w
 
             # Draw semi-transparent background for shoe text
-            shoe_overlay = out.copy()
-            cv2.rectangle(shoe_overlay, (shoe_bg_x1, shoe_bg_y1), (shoe_bg_x2, shoe_bg_y2), (0, 0, 0), -1)
-            cv2.addWeighted(shoe_overlay, 0.6, out, 0.4, 0, out)
+            _blend_filled_rect(out, (shoe_bg_x1, shoe_bg_y1), (shoe_bg_x2, shoe_bg_y2), (0, 0, 0), 0.6)
 
             # Draw shoe text (org is bottom-left)
             txt_x = shoe_bg_x1 + 2
@@ -241,30 +387,27 @@ def draw_tracks_on_image(
 
     # ----- DRAW TRAILS -----
     if track_history is not None:
-        def chaikin(points: List[Tuple[int, int]], iterations: int) -> List[Tuple[int, int]]:
-            if len(points) < 3 or iterations <= 0:
-                return list(points)
-            pts = [np.array(p, dtype=np.float32) for p in points]
+        def chaikin(points: np.ndarray, iterations: int) -> np.ndarray:
+            # Corner cutting on the whole polyline at once: each segment p->q becomes
+            # Q = 0.75p + 0.25q, R = 0.25p + 0.75q; the end points are kept
+            pts = np.asarray(points, dtype=np.float32)
             for _ in range(iterations):
                 if len(pts) < 3:
                     break
-                new_pts = [pts[0]]
-                for i in range(len(pts) - 1):
-                    p = pts[i]
-                    q = pts[i + 1]
-                    Q = 0.75 * p + 0.25 * q
-                    R = 0.25 * p + 0.75 * q
-                    new_pts.extend([Q, R])
-                new_pts.append(pts[-1])
-                pts = new_pts
-            return [(int(round(p[0])), int(round(p[1]))) for p in pts]
+                p, q = pts[:-1], pts[1:]
+                cut = np.empty((2 * len(p), 2), dtype=np.float32)
+                cut[0::2] = 0.75 * p + 0.25 * q
+                cut[1::2] = 0.25 * p + 0.75 * q
+                pts = np.concatenate((pts[:1], cut, pts[-1:]))
+            return np.rint(pts)
 
         for tr in tracks:
             tid = tr.get("id")
             if tid not in track_history:
                 continue
 
-            pts = list(track_history[tid])
+            # deque of (x, y) tuples or an (N, 2) array — both become one array here
+            pts = np.asarray(track_history[tid])
             if len(pts) < 2:
                 continue
 
@@ -274,7 +417,7 @@ def draw_tracks_on_image(
             draw_pts = chaikin(pts, smooth_iters) if smooth_trail else pts
 
             # Draw antialiased polyline
-            pts_np = np.array(draw_pts, dtype=np.int32).reshape(-1, 1, 2)
+            pts_np = draw_pts.astype(np.int32).reshape(-1, 1, 2)
             cv2.polylines(out, [pts_np], isClosed=False, color=color, thickness=trail_thickness, lineType=cv2.LINE_AA)
 
     return out
@@ -310,7 +453,7 @@ def create_video_with_tracks(
     if not os.path.exists(video_path):
         return False
 
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video_capture(video_path)
     if not cap.isOpened():
         return False
 
@@ -337,6 +480,13 @@ def create_video_with_tracks(
                 floor_mask = window_mask = None
                 floor_cfg = window_cfg = None
 
+        # Blend tables for the fixed frame size, so each frame is a LUT pass per mask
+        floor_overlay = window_overlay = None
+        if floor_mask is not None and floor_cfg is not None:
+            floor_overlay = prepare_mask_overlay(floor_mask, (height, width), color=floor_cfg.get("color", (0,255,0)), alpha=floor_cfg.get("alpha", 0.3))
+        if window_mask is not None and window_cfg is not None:
+            window_overlay = prepare_mask_overlay(window_mask, (height, width), color=window_cfg.get("color", (255,0,0)), alpha=window_cfg.get("alpha", 0.6))
+
         # Предварительная загрузка статической карты обуви (ID -> Label)
         # Это гарантирует, что метка будет видна на протяжении всего трека, а не только в кадре детекции
         static_shoes_map = {}
@@ -347,7 +497,10 @@ def create_video_with_tracks(
                 static_shoes_map = {}
 
         fourcc = cv2.VideoWriter_fourcc(*'h264')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        out = open_video_writer(output_path, fourcc, fps, (width, height))
+
+        # One pass over all tracks instead of a full scan per frame
+        tracks_index = build_tracks_index(tracks_data or {})
 
         frame_idx = 0
         while True:
@@ -358,14 +511,18 @@ def create_video_with_tracks(
             # Apply ROI masks first
             if include_roi_zones:
                 try:
-                    if floor_mask is not None and floor_cfg is not None:
+                    if floor_overlay is not None and frame.shape[:2] == (height, width):
+                        frame = apply_mask_overlay(frame, floor_overlay)
+                    elif floor_mask is not None and floor_cfg is not None:
                         frame = apply_mask_to_frame(frame, floor_mask, color=floor_cfg.get("color", (0,255,0)), alpha=floor_cfg.get("alpha", 0.3))
-                    if window_mask is not None and window_cfg is not None:
+                    if window_overlay is not None and frame.shape[:2] == (height, width):
+                        frame = apply_mask_overlay(frame, window_overlay)
+                    elif window_mask is not None and window_cfg is not None:
                         frame = apply_mask_to_frame(frame, window_mask, color=window_cfg.get("color", (255,0,0)), alpha=window_cfg.get("alpha", 0.6))
                 except Exception:
                     pass
 
-            tracks = get_frame_tracks(tracks_data or {}, frame_idx)
+            tracks = tracks_index.get(frame_idx, [])
             for tr in tracks:
                 tid = tr["id"]
                 bbox = tr["bbox"]
@@ -1,3 +1,8 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+
 def get_video_info(video_path):
     """Получить информацию о видео максимально надёжно с несколькими резервами.
 
@@ -164,4 +169,107 @@ def get_video_info(video_path):
     except Exception:
         pass
 
-    return info
\ No newline at end of file
+    return info
+
+class _PrefetchState:
+    """Общее состояние FramePrefetcher и его потока.
+
+    Поток получает только этот объект, а не сам FramePrefetcher — иначе поток держал бы
+    ссылку на владельца и тот никогда не собирался бы сборщиком мусора.
+    """
+
+    def __init__(self, ahead):
+        self.ahead = ahead
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.target = -1
+        self.stopped = False
+        self.thread = None
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+
+class FramePrefetcher:
+    """Фоновое чтение кадров вперёд от текущей позиции.
+
+    Держит собственный cv2.VideoCapture (объект не потокобезопасен, поэтому общий
+    с UI использовать нельзя) и буфер до `ahead` декодированных кадров {idx: BGR}.
+    `request(idx)` сообщает текущую позицию — поток дочитывает idx+1 .. idx+ahead
+    через grab()/retrieve(); `take(idx)` забирает кадр из буфера, если он уже готов.
+
+    Поток живёт, пока жив сам объект: когда владелец (состояние сессии) освобождает его,
+    weakref.finalize останавливает поток и закрывает VideoCapture. Тот же finalize
+    срабатывает при выходе из процесса — daemon-поток с открытым VideoCapture иначе
+    роняет интерпретатор.
+    """
+
+    def __init__(self, video_path, ahead=8):
+        self.video_path = video_path
+        self.ahead = ahead
+        self._state = state = _PrefetchState(ahead)
+        state.thread = threading.Thread(
+            target=_prefetch_loop, args=(video_path, state), name="frame-prefetch", daemon=True
+        )
+        state.thread.start()
+        self._finalizer = weakref.finalize(self, state.stop)
+
+    def take(self, frame_idx):
+        """Забирает готовый кадр из буфера (или None). Кадр можно менять на месте."""
+        state = self._state
+        with state.lock:
+            return state.frames.pop(frame_idx, None)
+
+    def request(self, frame_idx):
+        """Сдвигает окно предзагрузки на кадры после frame_idx."""
+        state = self._state
+        start = frame_idx + 1
+        with state.lock:
+            state.target = start
+            for idx in [i for i in state.frames if not (start <= i < start + self.ahead)]:
+                del state.frames[idx]
+        state.wake.set()
+
+    def close(self):
+        self._finalizer()
+
+
+def _prefetch_loop(video_path, state):
+    try:
+        import cv2
+        from .yolo_utils import open_video_capture, read_frame_from_capture
+    except Exception:
+        return
+
+    # Как и в кадре UI, поток переходит по CAP_PROP_POS_FRAMES — только программное декодирование
+    cap = open_video_capture(video_path, hw_accel=False)
+    if not cap.isOpened():
+        cap.release()
+        return
+    pos = 0
+    try:
+        while not state.stopped:
+            state.wake.wait()
+            state.wake.clear()
+            with state.lock:
+                start = state.target
+                wanted = [i for i in range(start, start + state.ahead) if i not in state.frames]
+            for idx in wanted:
+                if state.stopped or state.target != start:
+                    break
+                frame, pos = read_frame_from_capture(cap, idx, pos)
+                if frame is None:
+                    break
+                with state.lock:
+                    if state.target == start:
+                        state.frames[idx] = frame
+    except Exception:
+        pass
+    finally:
+        cap.release()
+        with state.lock:
+            state.frames.clear()
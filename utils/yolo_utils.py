@@ -1,21 +1,33 @@
 import json
 import os
+import queue
+import threading
 from typing import Dict, Any, List, Tuple, Optional
 
 import numpy as np
 
+try:
+    import orjson
+except Exception:  # optional: fall back to stdlib json
+    orjson = None
+
 
 def load_detections(json_path: str) -> Dict[str, Any]:
     """Load YOLO detections JSON.
 
     Expected schema contains keys: video_info, detection_info, results (list per frame).
-    Returns the parsed dictionary.
+    Returns the parsed dictionary. Uses orjson when installed (several times faster
+    on number-heavy files), stdlib json otherwise.
     """
     if not os.path.exists(json_path):
         return {"video_info": {}, "detection_info": {}, "results": []}
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(json_path, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
         # basic validation
         if not isinstance(data.get("results", []), list):
             data["results"] = []
@@ -67,14 +79,76 @@ def get_frame_detections(
             except Exception:
                 continue
 
-    # Apply confidence filtering if specified
-    if min_confidence is not None and detections:
-        detections = [
-            det for det in detections
-            if det.get("confidence", 0.0) >= min_confidence
-        ]
+    return filter_detections(detections, min_confidence)
+
+
+def filter_detections(
+        detections: List[Dict[str, Any]],
+        min_confidence: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Return detections with confidence >= min_confidence (all of them if None)."""
+    if min_confidence is None or not detections:
+        return detections
+    return [
+        det for det in detections
+        if det.get("confidence", 0.0) >= min_confidence
+    ]
+
+
+def build_detections_index(data: Dict[str, Any]) -> Dict[int, List[Dict[str, Any]]]:
+    """Build a {frame_idx: detections} index for O(1) per-frame lookup.
+
+    Frames without a usable "frame" field fall back to their position in results.
+    If a frame occurs several times, the first occurrence wins (as in get_frame_detections).
+    """
+    index: Dict[int, List[Dict[str, Any]]] = {}
+    for i, item in enumerate(data.get("results", []) or []):
+        if not isinstance(item, dict):
+            continue
+        try:
+            frame = int(item.get("frame", i))
+        except Exception:
+            continue
+        if frame not in index:
+            index[frame] = item.get("detections", []) or []
+    return index
+
+
+def build_detections_arrays(data: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Flatten detections into a struct-of-arrays layout.
 
-    return detections
+    Returns:
+        {"offsets": int64 array of len(frames) + 1, "confidence": float64 array,
+        "sorted_confidence": the same values sorted ascending}; detections of the
+        i-th frame occupy confidence[offsets[i]:offsets[i + 1]]
+    """
+    results = data.get("results", []) or []
+    frames = [
+        dets for dets in (item.get("detections", []) for item in results if isinstance(item, dict))
+        if isinstance(dets, list)
+    ]
+    counts = np.fromiter((len(dets) for dets in frames), dtype=np.int64, count=len(frames))
+    offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    conf = np.fromiter(
+        (d.get("confidence", 0.0) or 0.0 for dets in frames for d in dets),
+        dtype=np.float64,
+        count=int(offsets[-1])
+    )
+    return {"offsets": offsets, "confidence": conf, "sorted_confidence": np.sort(conf)}
+
+
+def avg_detections_from_arrays(arrays: Dict[str, np.ndarray], min_confidence: Optional[float] = None) -> float:
+    """Average detections per frame over build_detections_arrays() output."""
+    n_frames = len(arrays["offsets"]) - 1
+    if n_frames <= 0:
+        return 0.0
+    conf = arrays["sorted_confidence"]
+    total = conf.size
+    if min_confidence is not None:
+        # Everything from the first value >= min_confidence onwards passes: one binary search
+        total -= int(np.searchsorted(conf, min_confidence, side="left"))
+    return float(total) / float(n_frames)
 
 
 def compute_avg_detections(data: Dict[str, Any], min_confidence: Optional[float] = None) -> float:
@@ -87,23 +161,7 @@ def compute_avg_detections(data: Dict[str, Any], min_confidence: Optional[float]
     Returns:
         Average detections per frame
     """
-    results = data.get("results", [])
-    if not results:
-        return 0.0
-    total = 0
-    count = 0
-    for item in results:
-        if isinstance(item, dict):
-            dets = item.get("detections", [])
-            if isinstance(dets, list):
-                # Apply confidence filter if specified
-                if min_confidence is not None:
-                    dets = [d for d in dets if d.get("confidence", 0.0) >= min_confidence]
-                total += len(dets)
-                count += 1
-    if count == 0:
-        return 0.0
-    return float(total) / float(count)
+    return avg_detections_from_arrays(build_detections_arrays(data), min_confidence)
 
 
 def muted_color_palette(n: int) -> List[Tuple[int, int, int]]:
@@ -187,11 +245,159 @@ def read_frame(video_path: str, frame_idx: int) -> np.ndarray:
     return frame  # BGR
 
 
-def draw_bboxes_on_image(image_bgr: np.ndarray, detections: List[Dict[str, Any]]) -> np.ndarray:
+def open_video_capture(video_path: str, hw_accel: bool = True):
+    """Open a cv2.VideoCapture, asking the FFmpeg backend for hardware decoding.
+
+    With hw_accel, OpenCV picks any available accelerator (NVDEC/VA-API/D3D11/...)
+    and silently decodes in software when there is none. Falls back to a plain
+    capture on OpenCV builds without the acceleration properties.
+
+    Pass hw_accel=False for captures that seek with CAP_PROP_POS_FRAMES: exact-frame
+    seeking is only verified with software decoding. Sequential readers may keep it on.
+    """
+    import cv2
+
+    if hw_accel and hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        try:
+            cap = cv2.VideoCapture(
+                video_path,
+                cv2.CAP_FFMPEG,
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+            )
+            if cap.isOpened():
+                return cap
+            cap.release()
+        except Exception:
+            pass
+    return cv2.VideoCapture(video_path)
+
+
+def open_video_writer(output_path: str, fourcc: int, fps: float, frame_size: Tuple[int, int], hw_accel: bool = True):
+    """Open a cv2.VideoWriter, asking the FFmpeg backend for a hardware encoder.
+
+    Same fallbacks as open_video_capture: software encoding when no accelerator
+    is present, a plain writer on OpenCV builds without the property.
+    """
+    import cv2
+
+    if hw_accel and hasattr(cv2, "VIDEOWRITER_PROP_HW_ACCELERATION"):
+        try:
+            writer = cv2.VideoWriter(
+                output_path,
+                cv2.CAP_FFMPEG,
+                fourcc,
+                fps,
+                frame_size,
+                [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY],
+            )
+            if writer.isOpened():
+                return writer
+            writer.release()
+        except Exception:
+            pass
+    return cv2.VideoWriter(output_path, fourcc, fps, frame_size)
+
+
+def read_frame_from_capture(
+        cap,
+        frame_idx: int,
+        next_idx: int,
+        max_forward: int = 30,
+        out: Optional[np.ndarray] = None
+) -> Tuple[Optional[np.ndarray], int]:
+    """Read a single frame (BGR) from an already opened cv2.VideoCapture.
+
+    Args:
+        cap: Opened cv2.VideoCapture
+        frame_idx: Frame index to read
+        next_idx: Index of the frame the capture will decode next (-1 if unknown)
+        max_forward: Forward jumps shorter than this are served with grab() instead of a seek
+        out: Optional preallocated BGR buffer; OpenCV decodes into it when the shape matches
+
+    Returns:
+        Tuple (frame or None, new next_idx). Small forward jumps only grab() the skipped
+        frames without decoding them and retrieve() the target one; anything else falls
+        back to a CAP_PROP_POS_FRAMES seek.
+    """
+    try:
+        import cv2
+    except Exception:
+        return None, -1
+
+    frame_idx = max(0, int(frame_idx))
+    delta = frame_idx - next_idx
+    if next_idx < 0 or not (0 <= delta < max_forward):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        delta = 0
+
+    for _ in range(delta + 1):
+        if not cap.grab():
+            return None, -1
+    ok, frame = cap.retrieve(out) if out is not None else cap.retrieve()
+    if not ok:
+        return None, -1
+    return frame, frame_idx + 1
+
+
+def bgr_to_rgb(image_bgr: np.ndarray) -> np.ndarray:
+    """Convert a BGR image to a C-contiguous RGB array.
+
+    Uses cv2.cvtColor when OpenCV is available; otherwise copies the reversed
+    channel view into a contiguous array so downstream encoders don't have to.
+    """
+    if image_bgr is None:
+        return None
+    try:
+        import cv2
+        return cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+    except Exception:
+        return np.ascontiguousarray(image_bgr[:, :, ::-1])
+
+
+def encode_jpeg(image_bgr: np.ndarray, quality: int = 85) -> Optional[bytes]:
+    """Encode a BGR image to JPEG bytes with OpenCV.
+
+    Returns None if OpenCV is unavailable or encoding fails, so callers can fall
+    back to handing the array to the UI as is.
+    """
+    if image_bgr is None:
+        return None
+    try:
+        import cv2
+        ok, buf = cv2.imencode(".jpg", image_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    except Exception:
+        return None
+    return buf.tobytes() if ok else None
+
+
+def fit_to_width(image: np.ndarray, max_width: int) -> np.ndarray:
+    """Downscale an image to max_width (keeping aspect ratio) with INTER_AREA.
+
+    Images that are already narrow enough, or when OpenCV is unavailable, are returned as is.
+    """
+    if image is None or max_width <= 0:
+        return image
+    h, w = image.shape[:2]
+    if w <= max_width:
+        return image
+    try:
+        import cv2
+    except Exception:
+        return image
+    new_h = max(1, int(round(h * max_width / w)))
+    return cv2.resize(image, (max_width, new_h), interpolation=cv2.INTER_AREA)
+
+
+def draw_bboxes_on_image(
+        image_bgr: np.ndarray,
+        detections: List[Dict[str, Any]],
+        out: Optional[np.ndarray] = None
+) -> np.ndarray:
     """Draw bounding boxes with muted colors and labels onto a BGR image.
 
     Each bbox in detections is expected to have keys: class, confidence, bbox{x1,y1,x2,y2}.
-    Returns a new BGR image with overlays.
+    Returns a new BGR image with overlays. If `out` (same shape/dtype) is given, the result
+    is written there instead; pass `out=image_bgr` to draw in place without a copy.
     """
     if image_bgr is None:
         return None
@@ -200,35 +406,68 @@ def draw_bboxes_on_image(image_bgr: np.ndarray, detections: List[Dict[str, Any]]
     except Exception:
         return image_bgr
 
-    out = image_bgr.copy()
+    if out is not None and out.shape == image_bgr.shape and out.dtype == image_bgr.dtype:
+        if out is not image_bgr:
+            np.copyto(out, image_bgr)
+    else:
+        out = image_bgr.copy()
+    if not detections:
+        return out
     colors = muted_color_palette(max(1, len(detections)))
 
+    # Collect valid boxes into one (N, 4) int32 array
+    coords = []
+    kept = []
     for i, det in enumerate(detections):
         bbox = (det or {}).get("bbox", {})
         try:
-            x1 = int(round(bbox.get("x1", 0)))
-            y1 = int(round(bbox.get("y1", 0)))
-            x2 = int(round(bbox.get("x2", 0)))
-            y2 = int(round(bbox.get("y2", 0)))
+            coords.append((
+                int(round(bbox.get("x1", 0))),
+                int(round(bbox.get("y1", 0))),
+                int(round(bbox.get("x2", 0))),
+                int(round(bbox.get("y2", 0))),
+            ))
         except Exception:
             continue
+        kept.append(i)
+    if not kept:
+        return out
+    boxes = np.asarray(coords, dtype=np.int32)
+    # cv2.rectangle accepts corners in any order: sort them for the edges
+    edges = np.concatenate(
+        (np.minimum(boxes[:, :2], boxes[:, 2:]), np.maximum(boxes[:, :2], boxes[:, 2:])), axis=1
+    )
+
+    # Edges are slice assignments reproducing cv2.rectangle(thickness=2): a 3 px band
+    # centred on the box line, without the outer corner pixel. Label backgrounds are blended
+    # per box right after its edges, but only inside the label rectangle instead of the frame
+    h, w = out.shape[:2]
+    thickness = 2
+    half = thickness // 2
+
+    def _fill(ya, yb, xa, xb, color):
+        ya, yb, xa, xb = max(ya, 0), min(yb, h), max(xa, 0), min(xb, w)
+        if ya < yb and xa < xb:
+            out[ya:yb, xa:xb] = color
+
+    for i, (x1, y1, _, _), (ex1, ey1, ex2, ey2) in zip(kept, boxes.tolist(), edges.tolist()):
         color = colors[i % len(colors)]
-        # draw rectangle
-        cv2.rectangle(out, (x1, y1), (x2, y2), color, thickness=2)
-        # label
+        _fill(ey1 - half, ey1 + half + 1, ex1, ex2 + 1, color)
+        _fill(ey2 - half, ey2 + half + 1, ex1, ex2 + 1, color)
+        _fill(ey1, ey2 + 1, ex1 - half, ex1 + half + 1, color)
+        _fill(ey1, ey2 + 1, ex2 - half, ex2 + half + 1, color)
+
+        det = detections[i]
         cls_name = str(det.get("class", "obj"))
         conf = det.get("confidence", None)
         label = f"{cls_name}" if conf is None else f"conf: {conf:.2f}"
-        # background for text
         (tw, th), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
         th = th + baseline
-        x_bg2 = x1 + tw + 6
-        y_bg2 = y1 + th + 4
-        # semi-transparent bg
-        overlay = out.copy()
-        cv2.rectangle(overlay, (x1, y1), (x_bg2, y_bg2), color, thickness=-1)
-        cv2.addWeighted(overlay, 0.25, out, 0.75, 0, out)
-        # text
+        ya, yb = max(y1, 0), min(y1 + th + 4 + 1, h)
+        xa, xb = max(x1, 0), min(x1 + tw + 6 + 1, w)
+        if ya < yb and xa < xb:
+            roi = out[ya:yb, xa:xb]
+            roi[...] = cv2.addWeighted(np.full_like(roi, color), 0.25, roi, 0.75, 0)
         cv2.putText(out, label, (x1 + 3, y1 + th), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (20, 20, 20), 1, cv2.LINE_AA)
 
     return out
@@ -239,7 +478,8 @@ def create_video_with_detections(
         det_data: Dict[str, Any],
         output_path: str,
         min_confidence: Optional[float] = None,
-        progress_callback=None
+        progress_callback=None,
+        stride: int = 1
 ) -> bool:
     """Create a video with detections drawn on each frame.
 
@@ -249,6 +489,8 @@ def create_video_with_detections(
         output_path: Path to save output video
         min_confidence: Minimum confidence threshold
         progress_callback: Optional callback function for progress updates (receives frame_idx, total_frames)
+        stride: Keep every `stride`-th frame (e.g. the detection sampling rate). Skipped frames
+            are only grab()-ed, not decoded; output fps is divided by stride to keep the duration
 
     Returns:
         True if successful, False otherwise
@@ -261,7 +503,7 @@ def create_video_with_detections(
     if not os.path.exists(video_path):
         return False
 
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video_capture(video_path)
     if not cap.isOpened():
         return False
 
@@ -272,32 +514,86 @@ def create_video_with_detections(
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
+        stride = max(1, int(stride))
+
         # Create video writer
         fourcc = cv2.VideoWriter_fourcc(*'h264')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-        frame_idx = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # Get detections for current frame
-            dets = get_frame_detections(det_data, frame_idx, min_confidence)
-
-            # Draw detections
-            frame_with_dets = draw_bboxes_on_image(frame, dets)
+        out = open_video_writer(output_path, fourcc, fps / stride, (width, height))
+
+        # Three-stage pipeline: decode (reader thread) -> draw (this thread) -> encode
+        # (writer thread). OpenCV releases the GIL in decode/encode, so the stages overlap.
+        # Drawing and progress stay on the calling thread: progress_callback may touch
+        # Streamlit elements, which only work from the script thread.
+        done = object()
+        stop = threading.Event()
+        decoded: "queue.Queue" = queue.Queue(maxsize=8)
+        drawn: "queue.Queue" = queue.Queue(maxsize=8)
+        writer_errors: List[BaseException] = []
+
+        def _read():
+            idx = 0
+            try:
+                while not stop.is_set():
+                    # Skipped frames are demuxed only; the kept one is decoded by retrieve()
+                    if idx % stride:
+                        if not cap.grab():
+                            break
+                        idx += 1
+                        continue
+                    if not cap.grab():
+                        break
+                    ret, frame = cap.retrieve()
+                    if not ret:
+                        break
+                    decoded.put((idx, frame))
+                    idx += 1
+            finally:
+                decoded.put(done)
+
+        def _write():
+            while True:
+                frame = drawn.get()
+                if frame is done:
+                    break
+                if writer_errors:
+                    continue  # keep draining so the producer never blocks
+                try:
+                    out.write(frame)
+                except BaseException as e:
+                    writer_errors.append(e)
+
+        reader = threading.Thread(target=_read, name="export-decode", daemon=True)
+        writer = threading.Thread(target=_write, name="export-encode", daemon=True)
+        reader.start()
+        writer.start()
+        try:
+            while True:
+                item = decoded.get()
+                if item is done:
+                    break
+                frame_idx, frame = item
 
-            # Write frame
-            out.write(frame_with_dets)
+                # Get detections for current frame
+                dets = get_frame_detections(det_data, frame_idx, min_confidence)
 
-            # Progress callback
-            if progress_callback:
-                progress_callback(frame_idx, total_frames)
+                # Draw detections in place: the decoded frame is not reused
+                drawn.put(draw_bboxes_on_image(frame, dets, out=frame))
 
-            frame_idx += 1
+                # Progress callback
+                if progress_callback:
+                    progress_callback(frame_idx, total_frames)
+        finally:
+            stop.set()
+            # Unblock the reader if it is waiting on a full queue, then let the writer finish
+            while reader.is_alive():
+                try:
+                    decoded.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            drawn.put(done)
+            writer.join()
 
-        return True
+        return not writer_errors
 
     except Exception:
         return False